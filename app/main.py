@@ -1,14 +1,21 @@
 # app/main.py
 
+import aiofiles
 from fastapi import FastAPI, Form, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import Any, Optional, List, Dict
 from pathlib import Path
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 업로드 파일을 통째로 메모리에 올리지 않고 1MB씩 저장
+
 from src.agent.router import route_query, route_image_query  # 🔥 라우터 에이전트
 
-app = FastAPI()
+# pages[].image_base64 때문에 응답이 커질 수 있어 orjson 직렬화 사용
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # CORS 설정 (이미 있다면 중복되지만 큰 문제는 아님)
 app.add_middleware(
@@ -19,6 +26,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# base64 인라인 상한(2MB)을 넘는 페이지 이미지는 image_url로만 내려간다.
+# 그 URL이 이 앱에서 실제로 열리도록 정적 마운트를 맞춰 둔다:
+# - query_rag:        '/data/processed/...'
+# - route_image_query: '/manual_images/...' (data/processed 기준 상대 경로)
+# data/ 전체를 열면 sqlite DB와 업로드 파일까지 노출되므로 processed만 공개
+app.mount("/data/processed", StaticFiles(directory="data/processed"), name="data_processed")
+app.mount("/manual_images", StaticFiles(directory="data/processed"), name="manual_images")
+
 
 class AskResponse(BaseModel):
     answer: str
@@ -44,23 +59,35 @@ async def ask(
     - 텍스트만 오면: route_query() 사용 (RAG)
     - 이미지 + 텍스트 오면: route_image_query() 사용 (이미지 에이전트 + RAG)
     """
+    # 0) 빈/공백 질문이고 이미지도 없으면 라우팅·임베딩·DB 작업 없이 바로 반환
+    has_file = isinstance(file, UploadFile) and getattr(file, "filename", None)
+    if not query.strip() and not has_file:
+        return AskResponse(
+            answer="질문이 비어 있습니다. 내용을 입력해 주세요.",
+            intent="chat",
+            source="empty_query",
+        )
+
     # 1) 이미지가 같이 온 경우 → 파일 저장 후 이미지 라우팅
-    if isinstance(file, UploadFile) and getattr(file, "filename", None):
+    if has_file:
         upload_dir = Path("data/uploads")
         upload_dir.mkdir(parents=True, exist_ok=True)
 
         save_path = upload_dir / file.filename
-        with save_path.open("wb") as f:
-            f.write(await file.read())
+        async with aiofiles.open(save_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await f.write(chunk)
 
-        result = route_image_query(
+        # 라우터는 동기 함수(LLM 호출 + sqlite) → 이벤트 루프 막지 않게 스레드풀로 넘긴다
+        result = await run_in_threadpool(
+            route_image_query,
             query=query,
             image_path=str(save_path),
             k=k,
         ) or {}
     else:
         # 2) 텍스트만 온 경우 또는 file 필드가 비어 있는 경우 → 기존 RAG 라우터
-        result = route_query(query=query, k=k) or {}
+        result = await run_in_threadpool(route_query, query=query, k=k) or {}
 
     # 3) 라우터 결과를 AskResponse 형태로 정리
     return AskResponse(
@@ -1,10 +1,32 @@
+import heapq
+import io
+import mmap
 import re
 import sqlite3
+from itertools import islice
 from pathlib import Path
 import argparse
 
+# 숫자만 있는 줄 = 페이지 번호 (호출마다 컴파일하지 않도록 모듈 스코프에 둔다)
+PAGE_HEADER_RE = re.compile(r"^\s*(\d+)\s*$")
 
-def parse_pages(text: str):
+
+def _iter_file_lines(path: Path):
+    """merged 텍스트를 mmap으로 열어 한 줄씩 디코딩해서 내보낸다.
+
+    read_text()처럼 수백 페이지짜리 매뉴얼 전체를 문자열로 올리지 않고,
+    OS 페이지 캐시에 맡긴 채 현재 줄만 메모리에 둔다.
+    """
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:  # 빈 파일이면 mmap이 ValueError를 던짐
+            return
+        f.seek(0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for raw in iter(mm.readline, b""):
+                yield raw.decode("utf-8")
+
+
+def parse_pages(text):
     """
     규칙:
     - '숫자 한 줄만 있는 줄'을 페이지 번호로 인식
@@ -15,15 +37,17 @@ def parse_pages(text: str):
       [텍스트...]
       2
       → 1: 첫 블록, 2: 두 번째 블록
-    """
-    lines = text.splitlines()
 
+    text는 문자열 또는 '줄 iterable' (예: _iter_file_lines) 둘 다 받는다.
+    """
     page_map = {}
     buf = []              # 현재 페이지 텍스트를 임시로 쌓는 버퍼
-    page_header_pattern = re.compile(r"^\s*(\d+)\s*$")  # 숫자만 있는 줄
 
+    # splitlines()로 전체 줄 리스트를 또 만들지 않고 한 줄씩 스트리밍
+    lines = io.StringIO(text) if isinstance(text, str) else text
     for line in lines:
-        m = page_header_pattern.match(line)
+        line = line.rstrip("\r\n")
+        m = PAGE_HEADER_RE.match(line)
         if m:
             page_num = int(m.group(1))
 
@@ -49,42 +73,72 @@ def parse_pages(text: str):
     return page_map
 
 
+INSERT_BATCH_SIZE = 40  # executemany 한 번에 넣을 페이지 수
+
+
+def _pages_in_order(page_map: dict):
+    """(page, content)를 페이지 번호 오름차순으로 내보낸다.
+
+    merged 텍스트는 거의 항상 페이지 순서 그대로라 dict 삽입 순서가 이미
+    정렬되어 있음 → 그 경우 정렬 없이 그대로 순회하고, 아니면 heapq로 꺼낸다.
+    """
+    keys = list(page_map.keys())
+    if all(a < b for a, b in zip(keys, keys[1:])):
+        for p in keys:
+            yield p, page_map[p]
+        return
+
+    heapq.heapify(keys)
+    while keys:
+        p = heapq.heappop(keys)
+        yield p, page_map[p]
+
+
+def _chunks_insert_sql(cur: sqlite3.Cursor) -> str:
+    """chunks 스키마를 한 번만 확인해서 쓸 INSERT 문을 결정.
+
+    예전엔 페이지마다 try/except OperationalError로 폴백했는데,
+    그러면 매 행마다 SQL 재파싱이 일어나서 PRAGMA 프로브로 대체했다.
+    """
+    cur.execute("PRAGMA table_info(chunks)")
+    has_embedding = any(r[1] == "embedding" for r in cur.fetchall())
+    if has_embedding:
+        return "INSERT INTO chunks (manual_id, page, content, embedding) VALUES (?, ?, ?, NULL)"
+    return "INSERT INTO chunks (manual_id, page, content) VALUES (?, ?, ?)"
+
+
 def main(db_path: str, txt_path: str, manual_id: int):
     conn = sqlite3.connect(db_path)
     cur = conn.cursor()
 
+    # 벌크 로드용 PRAGMA: WAL + fsync 완화 (페이지 단위 INSERT 루프가 fsync에 묶이지 않도록)
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+
     print(f"[INFO] merged 텍스트 로딩: {txt_path}")
-    text = Path(txt_path).read_text(encoding="utf-8")
 
-    page_map = parse_pages(text)
-    print(f"[INFO] 총 {len(page_map)} 페이지 파싱됨: {sorted(page_map.keys())[:10]} ...")
+    # 파일 전체를 read_text로 올리지 않고 mmap 스트림으로 파싱
+    page_map = parse_pages(_iter_file_lines(Path(txt_path)))
+    print(f"[INFO] 총 {len(page_map)} 페이지 파싱됨: {heapq.nsmallest(10, page_map.keys())} ...")
 
-    # 기존 manual_id 데이터 삭제
-    cur.execute("DELETE FROM chunks WHERE manual_id = ?", (manual_id,))
-    conn.commit()
+    insert_sql = _chunks_insert_sql(cur)
 
-    # 페이지 순서대로 DB 저장
-    for page, content in sorted(page_map.items()):
-        if not content.strip():
-            continue
-
-        try:
-            cur.execute(
-                """
-                INSERT INTO chunks (manual_id, page, content, embedding)
-                VALUES (?, ?, ?, NULL)
-                """,
-                (manual_id, page, content),
-            )
-        except sqlite3.OperationalError:
-            cur.execute(
-                """
-                INSERT INTO chunks (manual_id, page, content)
-                VALUES (?, ?, ?)
-                """,
-                (manual_id, page, content),
-            )
+    rows = [
+        (manual_id, page, content)
+        for page, content in _pages_in_order(page_map)
+        if content.strip()
+    ]
 
+    # 기존 manual_id 데이터 삭제 + 재삽입을 단일 트랜잭션으로 묶는다
+    conn.execute("BEGIN")
+    cur.execute("DELETE FROM chunks WHERE manual_id = ?", (manual_id,))
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, INSERT_BATCH_SIZE))
+        if not batch:
+            break
+        cur.executemany(insert_sql, batch)
     conn.commit()
     conn.close()
 
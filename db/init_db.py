@@ -2,6 +2,7 @@
 from pathlib import Path
 import sys
 import sqlite3
+import zlib
 
 # ✅ 프로젝트 루트(/Users/yubin/Downloads/mindual-mcp)를 sys.path에 추가
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -10,20 +11,42 @@ if str(BASE_DIR) not in sys.path:
 
 from src.config import DB_PATH
 
+# schema.sql은 프로세스당 한 번만 읽고 (mtime, 내용) 으로 캐시
+_schema_cache: tuple[float, str] | None = None
+
+
+def _read_schema(schema_path: Path) -> str:
+    global _schema_cache
+    mtime = schema_path.stat().st_mtime
+    if _schema_cache is not None and _schema_cache[0] == mtime:
+        return _schema_cache[1]
+    sql = schema_path.read_text(encoding="utf-8")
+    _schema_cache = (mtime, sql)
+    return sql
+
+
 def init_db():
     db_path = Path(DB_PATH).resolve()
     schema_path = Path(__file__).with_name("schema.sql")
     if not schema_path.exists():
         raise FileNotFoundError(f"schema.sql not found at: {schema_path}")
 
-    schema_sql = schema_path.read_text(encoding="utf-8")
+    schema_sql = _read_schema(schema_path)
+    # 스키마 내용의 체크섬을 user_version에 넣어 두고, 같으면 warm start로 간주
+    schema_version = zlib.crc32(schema_sql.encode("utf-8")) & 0x7FFFFFFF
 
     print(f"[init_db] Using DB: {db_path}")
     print(f"[init_db] Using schema: {schema_path}")
 
     conn = sqlite3.connect(str(db_path))
     try:
+        (current_version,) = conn.execute("PRAGMA user_version").fetchone()
+        if current_version == schema_version:
+            print("[init_db] Schema up to date, skipping executescript")
+            return
+
         conn.executescript(schema_sql)
+        conn.execute(f"PRAGMA user_version = {schema_version}")
         conn.commit()
 
         # 테이블 목록 출력
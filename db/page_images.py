@@ -0,0 +1,44 @@
+# db/page_images.py
+# (manual_id, page) → 이미지 경로 매핑을 메모리에 올려두고 조회에 재사용
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from src.config import DB_PATH
+
+_lock = threading.Lock()
+_cache: tuple[float, Dict[Tuple[int, int], str]] | None = None  # (DB mtime, 매핑)
+
+
+def get_page_image_map() -> Dict[Tuple[int, int], str]:
+    """page_images 테이블 전체를 (manual_id, page) → path dict로 반환.
+
+    페이지 이미지는 ingest/등록 스크립트가 돌 때만 바뀌므로 한 번 읽어
+    캐시하고, DB 파일 mtime이 달라졌을 때만 다시 읽는다. 요청 처리 중의
+    이미지 경로 조회는 전부 메모리에서 끝난다.
+    """
+    global _cache
+    try:
+        mtime = Path(DB_PATH).stat().st_mtime
+    except OSError:
+        return {}
+
+    with _lock:
+        if _cache is not None and _cache[0] == mtime:
+            return _cache[1]
+
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            rows = conn.execute(
+                "SELECT manual_id, page, path FROM page_images"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # 테이블이 아직 없는 초기 DB
+            rows = []
+        finally:
+            conn.close()
+
+        mapping = {(m, p): path for m, p, path in rows}
+        _cache = (mtime, mapping)
+        return mapping
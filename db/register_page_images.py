@@ -1,5 +1,6 @@
 # db/register_page_images.py
 from pathlib import Path
+import os
 import re
 import sqlite3
 import sys
@@ -13,6 +14,12 @@ from src.config import DB_PATH  # 이미 쓰고 있는 DB_PATH 그대로 사용
 DATA_DIR = BASE_DIR / "data"
 PAGE_IMAGES_ROOT = DATA_DIR / "page_images"
 
+# 파일 이름 패턴: "page_3" 또는 "3" 둘 다 허용 (파일마다 re.match 두 번 돌리지 않도록 하나로 합침)
+PAGE_RE = re.compile(r"(?:page_)?(\d+)$", re.IGNORECASE)
+
+# 허용 확장자 (리스트 선형 탐색 대신 set 멤버십)
+IMAGE_EXTS = {".png", ".jpg", ".jpeg"}
+
 
 def ensure_table(conn: sqlite3.Connection) -> None:
     """page_images 테이블이 없으면 생성."""
@@ -40,35 +47,34 @@ def register_page_images() -> None:
     cur = conn.cursor()
     ensure_table(conn)
 
-    inserted = 0
+    rows = []  # (manual_id, page, rel_path) 모아서 한 번에 INSERT
 
     # ✅ data/page_images 아래의 manual_id 디렉토리들 순회
-    for manual_dir in sorted(PAGE_IMAGES_ROOT.iterdir()):
-        if not manual_dir.is_dir():
+    # (os.scandir는 디렉토리/파일 여부를 stat 재호출 없이 알려줌)
+    for manual_entry in sorted(os.scandir(PAGE_IMAGES_ROOT), key=lambda e: e.name):
+        if not manual_entry.is_dir():
             continue
 
         try:
-            manual_id = int(manual_dir.name)
+            manual_id = int(manual_entry.name)
         except ValueError:
-            print(f"⚠️ 디렉토리 이름이 숫자 아님, 건너뜀: {manual_dir}")
+            print(f"⚠️ 디렉토리 이름이 숫자 아님, 건너뜀: {manual_entry.path}")
             continue
 
         # ✅ manual_id 디렉토리 안의 이미지 파일들 순회
-        for img_path in sorted(manual_dir.iterdir()):
-            if not img_path.is_file():
+        for img_entry in sorted(os.scandir(manual_entry.path), key=lambda e: e.name):
+            if not img_entry.is_file():
                 continue
 
+            img_path = Path(img_entry.path)
+
             # 확장자 체크
-            if img_path.suffix.lower() not in [".png", ".jpg", ".jpeg"]:
+            if img_path.suffix.lower() not in IMAGE_EXTS:
                 print(f"⚠️ 이미지 파일 아님, 건너뜀: {img_path}")
                 continue
 
-            # 파일 이름 패턴: page_3.png 또는 3.png 둘 다 허용
             stem = img_path.stem  # "page_3" 또는 "3"
-            m = re.match(r"page_(\d+)$", stem, re.IGNORECASE)
-            if not m:
-                m = re.match(r"(\d+)$", stem)
-
+            m = PAGE_RE.match(stem)
             if not m:
                 print(f"⚠️ page_X 또는 X 형식 아님, 건너뜀: {img_path}")
                 continue
@@ -76,19 +82,19 @@ def register_page_images() -> None:
             page = int(m.group(1))
             # DB에는 data 기준 상대 경로로 저장 (예: "page_images/1/3.png")
             rel_path = str(img_path.relative_to(DATA_DIR))
+            rows.append((manual_id, page, rel_path))
 
-            cur.execute(
-                """
-                INSERT OR REPLACE INTO page_images (manual_id, page, path)
-                VALUES (?, ?, ?)
-                """,
-                (manual_id, page, rel_path),
-            )
-            inserted += 1
-
+    # 파일마다 execute+commit 하지 않고 단일 트랜잭션으로 한 번에 저장
+    cur.executemany(
+        """
+        INSERT OR REPLACE INTO page_images (manual_id, page, path)
+        VALUES (?, ?, ?)
+        """,
+        rows,
+    )
     conn.commit()
     conn.close()
-    print(f"✅ page_images 등록 완료: {inserted} rows")
+    print(f"✅ page_images 등록 완료: {len(rows)} rows")
 
 
 if __name__ == "__main__":
@@ -11,6 +11,15 @@ def get_conn():
     conn.row_factory = sqlite3.Row
     return conn
 
+def _as_json(value) -> str:
+    """이미 직렬화된 str이면 그대로 쓰고, 아니면 한 번만 json.dumps 한다.
+
+    호출부가 json 문자열을 만들어 넘기는 경우 재직렬화(이중 인코딩)를 피하기 위함.
+    """
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
 def upsert_manual(
     file_name: str,
     model_list: Sequence[str],
@@ -32,7 +41,7 @@ def upsert_manual(
           language=excluded.language,
           title=excluded.title,
           created_at=excluded.created_at
-        """, (file_name, json.dumps(list(model_list), ensure_ascii=False), language, title, created_at))
+        """, (file_name, _as_json(model_list if isinstance(model_list, str) else list(model_list)), language, title, created_at))
         conn.commit()
         row = conn.execute("SELECT id FROM manuals WHERE file_name=?", (file_name,)).fetchone()
         return int(row["id"])
@@ -55,7 +64,7 @@ def insert_chunk(
         cur = conn.execute("""
         INSERT INTO chunks(manual_id, section_id, page, content, meta)
         VALUES (?, ?, ?, ?, ?)
-        """, (manual_id, section_id, page, content, json.dumps(meta, ensure_ascii=False)))
+        """, (manual_id, section_id, page, content, _as_json(meta)))
         chunk_id = cur.lastrowid
 
         # FTS5 가상테이블에 content 동기화
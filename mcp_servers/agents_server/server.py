@@ -61,7 +61,9 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
             if not query.strip():
                 return [TextContent(type="text", text="query 가 비어 있습니다.")]
 
-            answer = answer_query(query, k=k)  # scripts/query_rag.py 함수 호출
+            # answer_query는 동기 함수(FAISS + sqlite + Gemini) → 이벤트 루프가
+            # 다른 MCP 요청을 처리할 수 있게 워커 스레드로 넘긴다
+            answer = await asyncio.to_thread(answer_query, query, k=k)
             return [TextContent(type="text", text=answer)]
 
         # 여기에 나중에 다른 에이전트/툴 추가 가능
@@ -1,13 +1,33 @@
 # src/agent/calendar_server.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import RedirectResponse
 from google_auth_oauthlib.flow import Flow
 from pathlib import Path
-import os
+import time
 
 SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
 REDIRECT_URI = "http://localhost:8100/calendar/oauth2callback"
 
+# OAuth state 보관: os.environ 대신 짧은 TTL의 인메모리 dict
+# (환경변수는 프로세스 전역이라 동시 인증 시 서로 덮어쓰고, 만료도 안 됨)
+OAUTH_STATE_TTL_SEC = 600
+_oauth_states: dict[str, float] = {}  # state → 만료 시각
+
+
+def _remember_state(state: str) -> None:
+    now = time.monotonic()
+    # 만료된 state 정리 후 저장
+    for s, exp in list(_oauth_states.items()):
+        if exp <= now:
+            del _oauth_states[s]
+    _oauth_states[state] = now + OAUTH_STATE_TTL_SEC
+
+
+def _consume_state(state: str) -> bool:
+    exp = _oauth_states.pop(state, None)
+    return exp is not None and exp > time.monotonic()
+
+
 app = FastAPI()
 
 @app.get("/calendar/auth")
@@ -19,14 +39,15 @@ def calendar_auth():
         redirect_uri=REDIRECT_URI,
     )
     auth_url, state = flow.authorization_url(prompt="consent")
-    os.environ["OAUTH_STATE"] = state
+    _remember_state(state)
     return RedirectResponse(auth_url)
 
 
 @app.get("/calendar/oauth2callback")
-def calendar_callback(code: str):
+def calendar_callback(code: str, state: str = ""):
     # 구글이 되돌려준 code로 토큰 발급받고 token.json 저장
-    state = os.environ.get("OAUTH_STATE")
+    if not _consume_state(state):
+        raise HTTPException(status_code=400, detail="유효하지 않거나 만료된 OAuth state 입니다.")
     flow = Flow.from_client_secrets_file(
         "credentials.json",
         scopes=SCOPES,
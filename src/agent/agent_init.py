@@ -21,9 +21,13 @@ if GEMINI_API_KEY:
 
 _model = genai.GenerativeModel(GEMINI_MODEL_ID) if GEMINI_API_KEY else None
 
+# Gemini 호출 한도: 요청당 타임아웃 + 재시도 예산 (무한 대기/무한 재시도 방지)
+GEMINI_TIMEOUT_SEC = 30
+GEMINI_MAX_RETRIES = 2
+
 def _call_gemini(prompt: str) -> str:
     """
-    Gemini 호출 래퍼: 로그와 간단한 타임 계측만 추가
+    Gemini 호출 래퍼: SDK 타임아웃 + 제한된 재시도, 로그와 간단한 타임 계측
     """
     if _model is None:
         # 안전장치: 모델이 없을 때는 바로 리턴
@@ -33,15 +37,30 @@ def _call_gemini(prompt: str) -> str:
     print("[Gemini] call start")
     t0 = time.time()
 
-    # 💡 아주 거친 타임아웃: 30초 이상 걸리면 예외 던지기
-    #   SDK 자체 타임아웃이 없어서 무한 대기하면, 여기서라도 끊어주자는 느낌
-    try:
-        resp = _model.generate_content(
-            prompt,
-        )
-    except Exception as e:
-        print("[Gemini] exception:", repr(e))
-        raise
+    resp = None
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        try:
+            resp = _model.generate_content(
+                prompt,
+                request_options={"timeout": GEMINI_TIMEOUT_SEC},
+            )
+            break
+        except Exception as e:
+            msg = str(e)
+            # 429/쿼터/타임아웃 류만 재시도, 그 외는 바로 전파
+            retryable = (
+                "429" in msg
+                or "Resource exhausted" in msg
+                or "Deadline" in msg
+                or "timeout" in msg.lower()
+            )
+            if retryable and attempt < GEMINI_MAX_RETRIES:
+                wait = 1.5 ** attempt
+                print(f"[Gemini] retry {attempt + 1}/{GEMINI_MAX_RETRIES} in {wait:.1f}s ({msg[:80]})")
+                time.sleep(wait)
+                continue
+            print("[Gemini] exception:", repr(e))
+            raise
 
     dt = time.time() - t0
     print(f"[Gemini] call end, {dt:.2f}s")
@@ -64,13 +83,11 @@ def _build_context(query: str, hits: List[Dict[str, Any]]) -> str:
     if not hits:
         return "검색 결과 없음."
 
-    lines: List[str] = []
-    for i, h in enumerate(hits, 1):
-        prefix = f"[{i}] (page {h.get('page', '?')})"
-        content = h.get("content", "")
-        lines.append(f"{prefix}\n{content}\n")
-
-    return "\n".join(lines)
+    # 중간 리스트 없이 제너레이터를 바로 join (히트가 많아도 한 번에 할당)
+    return "\n".join(
+        f"[{i}] (page {h.get('page', '?')})\n{h.get('content', '')}\n"
+        for i, h in enumerate(hits, 1)
+    )
 
 
 # ---------- 메인 엔트리: answer_query ----------
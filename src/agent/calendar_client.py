@@ -10,14 +10,19 @@ from googleapiclient.discovery import build
 SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
 
 
+_service = None  # 캐시된 Calendar 서비스 객체
+
+
 def _get_calendar_service():
     """
-    Google Calendar API 서비스 객체 생성.
+    Google Calendar API 서비스 객체 생성 (최초 1회만 빌드하고 재사용).
     token.json 은 Google Calendar Quickstart를 통해 미리 발급 받아 두었다고 가정.
     """
-    creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-    service = build("calendar", "v3", credentials=creds)
-    return service
+    global _service
+    if _service is None:
+        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+        _service = build("calendar", "v3", credentials=creds)
+    return _service
 
 
 def create_reminder_event(
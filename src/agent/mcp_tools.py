@@ -2,25 +2,32 @@
 # MCP Tool: RAG 검색, 오류 조회, 제안 기능 호출
 from typing import Optional, Dict, Any, List
 import sqlite3
+import threading
 from src.config import DB_PATH
 from src.index.fts import fts_search
 
+# 호출마다 connect/close 하지 않고 스레드별로 연결을 재사용
+_local = threading.local()
+
+def _get_conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+    return conn
+
 def search_manual(query: str) -> List[Dict[str, Any]]:
     """FTS5 기반 매뉴얼 검색 → 상위 문단 리스트 반환"""
     return fts_search(query)
 
 def lookup_trouble(code: str) -> Optional[Dict[str, Any]]:
     """오류코드 조회 (없으면 None)"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        row = conn.execute(
-            "SELECT code, symptom, cause, resolution_step_id FROM troubleshooting WHERE code=? LIMIT 1",
-            (code,)
-        ).fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    row = _get_conn().execute(
+        "SELECT code, symptom, cause, resolution_step_id FROM troubleshooting WHERE code=? LIMIT 1",
+        (code,)
+    ).fetchone()
+    return dict(row) if row else None
 
 def propose_next_action(device_state: Dict[str, Any]) -> Optional[str]:
     """아주 간단한 규칙 기반 제안 (MVP)"""
@@ -1,5 +1,6 @@
 # scripts/query_rag.py
 import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
@@ -9,8 +10,47 @@ if str(ROOT) not in sys.path:
 
 from src.index.build_embeddings_and_index import search
 from src.config import GEMINI_API_KEY, GEMINI_MODEL_ID, DB_PATH
+from db.page_images import get_page_image_map
 import google.generativeai as genai
 import sqlite3
+import threading
+
+# 질의마다 connect/close 를 반복하지 않도록 스레드별 연결 재사용
+_local = threading.local()
+
+# Gemini 모델도 싱글턴으로 재사용 (configure + 모델 생성은 호출마다 할 필요 없음)
+_model = None
+
+
+def _get_model() -> genai.GenerativeModel:
+    global _model
+    if _model is None:
+        genai.configure(api_key=GEMINI_API_KEY)
+        _model = genai.GenerativeModel(GEMINI_MODEL_ID)
+    return _model
+
+
+def _get_conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        _local.conn = conn
+    return conn
+
+
+@lru_cache(maxsize=32)
+def context_sql(n: int) -> str:
+    """히트 n개짜리 컨텍스트 조회 SQL.
+
+    SQL 텍스트를 n별로 메모이즈해서 매 요청 f-string으로 새로 만들지 않는다.
+    같은 텍스트가 재사용되면 sqlite3 연결의 statement cache가 파싱을 건너뛴다.
+    이미지 경로는 더 이상 JOIN하지 않고 get_page_image_map()에서 가져온다.
+    """
+    placeholders = ",".join("?" * n)
+    return (
+        "SELECT id, content, manual_id, page FROM chunks "
+        f"WHERE id IN ({placeholders})"
+    )
 
 
 def answer_query(query: str, k: int = 5) -> Dict[str, Any]:
@@ -46,66 +86,65 @@ def answer_query(query: str, k: int = 5) -> Dict[str, Any]:
         }
 
     # 2. DB에서 텍스트 + 페이지 이미지 경로 조회
-    conn = sqlite3.connect(DB_PATH)
+    conn = _get_conn()
     contexts: list[str] = []
     pages: list[Dict[str, Any]] = []
 
-    try:
-        for rid, score in results:
-            row = conn.execute(
-                """
-                SELECT c.content, c.manual_id, c.page, p.path
-                FROM chunks c
-                LEFT JOIN page_images p
-                  ON c.manual_id = p.manual_id AND c.page = p.page
-                WHERE c.id = ?
-                """,
-                (rid,),
-            ).fetchone()
-
-            if not row:
-                continue
-
-            content, manual_id, page, page_img = row
-
-            # LLM 컨텍스트용 텍스트
-            contexts.append(f"[p.{page}] {content}")
-
-            # 프론트에 넘길 페이지/이미지 정보
-            # 이 (manual_id, page)에 해당하는 이미지가 존재할 때만 image_path / image_url을 설정한다.
-            raw_path: str | None = None
-            image_url: str | None = None
-
-            if page_img:
-                raw_path = page_img
-                fs_path = Path(str(raw_path))
-
-                # DB 경로가 'data/...' 로 시작하면 그대로 '/data/...' 로 매핑한다.
-                # 예: raw_path='data/processed/삼성 냉장고/page_16.jpg'
-                #     → image_url='/data/processed/삼성 냉장고/page_16.jpg'
-                raw_path_str = str(raw_path)
-                if raw_path_str.startswith("data/"):
-                    image_url = f"/{raw_path_str}"
-                else:
-                    # 그 외 경로는 /static 아래에 그대로 노출한다.
-                    image_url = f"/static/{fs_path.as_posix()}"
-
-            page_entry: Dict[str, Any] = {
-                "manual_id": manual_id,
-                "page": page,
-                "score": float(score),
-                "text": content,  # ✅ 해당 페이지의 원문 텍스트 (디버깅/출처 표시용)
-            }
-
-            # 실제 이미지가 있는 경우에만 관련 필드를 추가
-            if raw_path:
-                page_entry["image_path"] = raw_path
-            if image_url:
-                page_entry["image_url"] = image_url  # ✅ 에이전트 응답에 바로 쓸 수 있는 URL
-
-            pages.append(page_entry)
-    finally:
-        conn.close()
+    # 검색 결과 id들을 IN 리스트로 묶어 한 번에 조회 (히트 수만큼 SELECT 반복 방지)
+    rids = [rid for rid, _ in results]
+    row_by_id = {}
+    if rids:
+        rows = conn.execute(context_sql(len(rids)), rids).fetchall()
+        row_by_id = {r[0]: r[1:] for r in rows}
+
+    # 이미지 경로는 시작 시 올려둔 인메모리 매핑에서 조회
+    page_image_map = get_page_image_map()
+
+    # FAISS 점수 순서를 유지하면서 매칭
+    for rid, score in results:
+        row = row_by_id.get(rid)
+        if not row:
+            continue
+
+        content, manual_id, page = row
+        page_img = page_image_map.get((manual_id, page))
+
+        # LLM 컨텍스트용 텍스트
+        contexts.append(f"[p.{page}] {content}")
+
+        # 프론트에 넘길 페이지/이미지 정보
+        # 이 (manual_id, page)에 해당하는 이미지가 존재할 때만 image_path / image_url을 설정한다.
+        raw_path: str | None = None
+        image_url: str | None = None
+
+        if page_img:
+            raw_path = page_img
+            fs_path = Path(str(raw_path))
+
+            # DB 경로가 'data/...' 로 시작하면 그대로 '/data/...' 로 매핑한다.
+            # 예: raw_path='data/processed/삼성 냉장고/page_16.jpg'
+            #     → image_url='/data/processed/삼성 냉장고/page_16.jpg'
+            raw_path_str = str(raw_path)
+            if raw_path_str.startswith("data/"):
+                image_url = f"/{raw_path_str}"
+            else:
+                # 그 외 경로는 /static 아래에 그대로 노출한다.
+                image_url = f"/static/{fs_path.as_posix()}"
+
+        page_entry: Dict[str, Any] = {
+            "manual_id": manual_id,
+            "page": page,
+            "score": float(score),
+            "text": content,  # ✅ 해당 페이지의 원문 텍스트 (디버깅/출처 표시용)
+        }
+
+        # 실제 이미지가 있는 경우에만 관련 필드를 추가
+        if raw_path:
+            page_entry["image_path"] = raw_path
+        if image_url:
+            page_entry["image_url"] = image_url  # ✅ 에이전트 응답에 바로 쓸 수 있는 URL
+
+        pages.append(page_entry)
 
     if not contexts:
         return {
@@ -124,8 +163,7 @@ def answer_query(query: str, k: int = 5) -> Dict[str, Any]:
             "pages": pages,
         }
 
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel(GEMINI_MODEL_ID)
+    model = _get_model()
 
     prompt = (
         "다음 전자제품 사용설명서 내용을 참고해서, 질문에 한국어로 자세히 답변해줘.\n"
@@ -14,6 +14,7 @@ for p in (str(ROOT), str(ROOT / "src"), str(ROOT / "db")):
         sys.path.insert(0, str(p))
 
 from src.index.build_embeddings_and_index import search  # search("chunks", query, k)
+from src.agent.query_rag import context_sql
 from src.config import DB_PATH
 
 
@@ -26,16 +27,21 @@ def load_contexts(rids, manual_id: int | None = None):
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
 
+    # 히트 수만큼 SELECT를 반복하지 않고 IN 리스트로 한 번에 조회
+    ids = [rid for rid, _ in rids]
+    row_by_id = {}
+    if ids:
+        rows = cur.execute(context_sql(len(ids)), ids).fetchall()
+        row_by_id = {r[0]: r[1:] for r in rows}  # id → (content, manual_id, page)
+
     results = []
+    # FAISS 점수 순서 유지
     for rid, score in rids:
-        row = cur.execute(
-            "SELECT manual_id, page, content FROM chunks WHERE id = ?",
-            (rid,),
-        ).fetchone()
+        row = row_by_id.get(rid)
         if not row:
             continue
 
-        man_id, page, content = row
+        content, man_id, page = row
         if manual_id and man_id != manual_id:
             # 혹시 인덱스가 전체 매뉴얼 기준으로 만들어졌을 때 필터링
             continue
@@ -1,8 +1,11 @@
 # src/agent/router.py
 from __future__ import annotations
 
+import binascii
 import re
 import sqlite3
+import stat as stat_module
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import (
     Literal,
@@ -18,7 +21,8 @@ import google.generativeai as genai
 
 from src.config import GEMINI_API_KEY, GEMINI_MODEL_ID, DB_PATH
 from src.index.build_embeddings_and_index import search
-from src.agent.query_rag import answer_query  # 텍스트 RAG용
+from src.agent.query_rag import answer_query, context_sql  # 텍스트 RAG용
+from db.page_images import get_page_image_map
 from src.agent.image_to_text_agent import analyze_image
 from src.agent.answer_synthesis import AnswerSynthesisAgent
 
@@ -26,6 +30,95 @@ from src.agent.answer_synthesis import AnswerSynthesisAgent
 Intent = Literal["manual", "chat"]  # 나중에 "schedule", "image_help" 등 추가 가능
 
 
+# 매뉴얼 관련 키워드 (classify_intent / classify_image_intent 공용)
+MANUAL_KEYWORDS = (
+    "사용법", "사용 방법", "어떻게 하나", "어떻게 하냐",
+    "필터", "청소", "세척", "설정", "버튼", "리셋", "reset",
+    "에러", "오류", "점검", "경고등",
+    "공기청정기", "청소기", "전자레인지", "세탁기", "에어컨",
+    "설명서", "매뉴얼",
+)
+
+# 키워드별 'in' 검사를 파이썬 루프로 돌리지 않고 한 번의 regex 스캔으로 처리
+_MANUAL_KW_RE = re.compile("|".join(map(re.escape, MANUAL_KEYWORDS)))
+
+
+# ---------- 페이지 이미지 base64 인코딩 (응답마다 재인코딩 방지 캐시) ----------
+
+_MIME_BY_SUFFIX = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+# (경로, mtime) → data URI. 같은 페이지가 여러 응답에 반복 등장해도 한 번만 인코딩.
+_IMAGE_B64_CACHE: Dict[Tuple[str, float], str] = {}
+_IMAGE_B64_CACHE_MAX = 64
+
+# 페이지 이미지 파일 읽기/인코딩용 스레드풀 (히트별 I/O를 순차로 기다리지 않게)
+_IMAGE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="page-img")
+
+# 이 크기를 넘는 이미지는 base64로 인라인하지 않는다.
+# 프론트는 image_url로 받아가고, StaticFiles 마운트가 sendfile로 스트리밍한다.
+_MAX_INLINE_IMAGE_BYTES = 2 * 1024 * 1024
+
+# Gemini에 넘길 페이지 이미지의 긴 변 상한 (풀 해상도 디코드 방지)
+_PAGE_IMAGE_MAX_SIDE = 1024
+
+
+def _enrich_page_with_image(p: Dict[str, Any]) -> Dict[str, Any]:
+    """페이지 dict 복사본에 image_base64를 붙여서 반환 (이미지 없으면 그대로)."""
+    page_data = dict(p)
+    img_path = page_data.get("image_path") or page_data.get("image_url")
+    if img_path:
+        try:
+            uri = _image_data_uri(img_path)
+            if uri:
+                page_data["image_base64"] = uri
+        except Exception:
+            pass
+    return page_data
+
+
+def _enrich_pages(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """pages 전체에 image_base64를 붙인다.
+
+    route_query / route_image_query 공용 진입점. 같은 경로는 _image_data_uri
+    캐시 덕에 응답당 최대 한 번만 인코딩되고, 파일 I/O는 스레드풀로 겹친다.
+    """
+    if not pages:
+        return pages
+    return list(_IMAGE_POOL.map(_enrich_page_with_image, pages))
+
+
+def _image_data_uri(path_like: str) -> Optional[str]:
+    """페이지 이미지 파일을 data URI로 인코딩.
+
+    파일이 없거나 인라인하기엔 너무 크면 None을 반환한다
+    (큰 파일은 통째로 읽지 않고 image_url 경유 스트리밍에 맡긴다).
+    """
+    fs_path = Path(str(path_like))
+    try:
+        st = fs_path.stat()
+    except OSError:
+        return None
+    if not stat_module.S_ISREG(st.st_mode) or st.st_size > _MAX_INLINE_IMAGE_BYTES:
+        return None
+
+    key = (str(fs_path), st.st_mtime)
+    cached = _IMAGE_B64_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    raw = fs_path.read_bytes()
+    mime = _MIME_BY_SUFFIX.get(fs_path.suffix.lower(), "image/*")
+    # b2a_base64는 b64encode보다 래핑이 얇아서 큰 이미지에서 조금 더 싸다
+    b64 = binascii.b2a_base64(raw, newline=False).decode("ascii")
+    uri = f"data:{mime};base64,{b64}"
+
+    if len(_IMAGE_B64_CACHE) >= _IMAGE_B64_CACHE_MAX:
+        # 여러 스레드가 동시에 evict하면 같은 키를 집을 수 있으므로 default로 KeyError 방지
+        _IMAGE_B64_CACHE.pop(next(iter(_IMAGE_B64_CACHE)), None)  # 가장 오래된 것부터 제거
+    _IMAGE_B64_CACHE[key] = uri
+    return uri
+
+
 def classify_intent(query: str) -> Intent:
     """
     아주 단순 rule-based 질의 분류.
@@ -34,23 +127,25 @@ def classify_intent(query: str) -> Intent:
     """
     q = query.strip()
 
-    # 매뉴얼 관련 키워드들
-    manual_keywords = [
-        "사용법", "사용 방법", "어떻게 하나", "어떻게 하냐",
-        "필터", "청소", "세척", "설정", "버튼", "리셋", "reset",
-        "에러", "오류", "점검", "경고등",
-        "공기청정기", "청소기", "전자레인지", "세탁기", "에어컨",
-        "설명서", "매뉴얼"
-    ]
-
-    for kw in manual_keywords:
-        if kw in q:
-            return "manual"
+    if _MANUAL_KW_RE.search(q):
+        return "manual"
 
     # 일단 기본은 chat으로
     return "chat"
 
 
+# chat용 Gemini 모델 싱글턴 (configure + 모델 생성은 최초 1회만)
+_chat_model = None
+
+
+def _get_chat_model() -> genai.GenerativeModel:
+    global _chat_model
+    if _chat_model is None:
+        genai.configure(api_key=GEMINI_API_KEY)
+        _chat_model = genai.GenerativeModel(GEMINI_MODEL_ID)
+    return _chat_model
+
+
 def chat_with_gemini(query: str) -> str:
     """
     매뉴얼이 아닌 일반 질문에 대해 Gemini로 바로 답변.
@@ -58,8 +153,7 @@ def chat_with_gemini(query: str) -> str:
     if not GEMINI_API_KEY:
         return "⚠️ LLM API 키가 설정되어 있지 않아 일반 대화를 처리할 수 없습니다."
 
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel(GEMINI_MODEL_ID)
+    model = _get_chat_model()
 
     prompt = (
         "너는 전자기기 사용자 도우미야. 너무 장황하지 않게, 친절하게 답해줘.\n\n"
@@ -104,31 +198,7 @@ def route_query(query: str, k: int = 5) -> Dict[str, Any]:
         pages = rag_result.get("pages", []) or []
 
         # --- 페이지 이미지 base64 인코딩 추가 ---
-        import base64
-        enriched_pages = []
-        for p in pages:
-            page_data = dict(p)
-            img_path = page_data.get("image_path") or page_data.get("image_url")
-            if img_path:
-                try:
-                    from pathlib import Path
-                    fs_path = Path(str(img_path))
-                    if fs_path.is_file():
-                        with fs_path.open("rb") as f:
-                            raw = f.read()
-                        suffix = fs_path.suffix.lower()
-                        if suffix in [".jpg", ".jpeg"]:
-                            mime = "image/jpeg"
-                        elif suffix == ".png":
-                            mime = "image/png"
-                        else:
-                            mime = "image/*"
-                        b64 = base64.b64encode(raw).decode("ascii")
-                        page_data["image_base64"] = f"data:{mime};base64,{b64}"
-                except Exception:
-                    pass
-            enriched_pages.append(page_data)
-        pages = enriched_pages
+        pages = _enrich_pages(pages)
 
         error = rag_result.get("error")
     else:
@@ -199,14 +269,7 @@ def classify_image_intent(query: Optional[str]) -> ImageIntent:
         return "image_other"
 
     q = query.strip()
-    manual_keywords = [
-        "사용법", "사용 방법", "어떻게 하나", "어떻게 하냐",
-        "필터", "청소", "세척", "설정", "버튼", "리셋", "reset",
-        "에러", "오류", "점검", "경고등",
-        "공기청정기", "청소기", "전자레인지", "세탁기", "에어컨",
-        "설명서", "매뉴얼"
-    ]
-    if any(kw in q for kw in manual_keywords):
+    if _MANUAL_KW_RE.search(q):
         return "image_manual"
     return "image_other"
 
@@ -259,24 +322,29 @@ def route_image_query(query: str, image_path: str, k: int = 5) -> Dict[str, Any]
     conn = sqlite3.connect(DB_PATH)
     retrieved_sentences: List[str] = []
     pages: List[Dict[str, Any]] = []
+    # (페이지 dict, base64 인코딩 future) 쌍 — DB 루프 안에서 인코딩을 스레드풀에
+    # 바로 던져서, 페이지 목록을 한 번 더 돌며 dict를 복사하는 두 번째 패스를 없앤다.
+    pending_b64: List[Tuple[Dict[str, Any], Any]] = []
 
     try:
-        for rid, score in results:
-            row = conn.execute(
-                """
-                SELECT c.content, c.manual_id, c.page, p.path
-                FROM chunks c
-                LEFT JOIN page_images p
-                  ON c.manual_id = p.manual_id AND c.page = p.page
-                WHERE c.id = ?
-                """,
-                (rid,),
-            ).fetchone()
+        # 히트 id들을 IN 리스트로 묶어 한 번에 조회 (히트 수만큼 SELECT 반복 방지)
+        rids = [rid for rid, _ in results]
+        row_by_id: Dict[int, Tuple] = {}
+        if rids:
+            rows = conn.execute(context_sql(len(rids)), rids).fetchall()
+            row_by_id = {r[0]: r[1:] for r in rows}
 
+        # 이미지 경로는 시작 시 올려둔 인메모리 매핑에서 조회
+        page_image_map = get_page_image_map()
+
+        # FAISS 점수 순서 유지
+        for rid, score in results:
+            row = row_by_id.get(rid)
             if not row:
                 continue
 
-            content, manual_id, page, page_img = row
+            content, manual_id, page = row
+            page_img = page_image_map.get((manual_id, page))
             retrieved_sentences.append(content)
 
             image_path_value: Optional[str] = None
@@ -299,25 +367,40 @@ def route_image_query(query: str, image_path: str, k: int = 5) -> Dict[str, Any]
                     # 예상 경로 형식이 아니면, 일반 static 프리픽스를 사용 (환경에 맞게 조정 가능)
                     image_url = f"/static/{fs_path.as_posix()}"
 
-            pages.append(
-                {
-                    "manual_id": manual_id,
-                    "page": page,
-                    "image_path": image_path_value,
-                    "image_url": image_url,
-                    "text": content,  # ✅ 해당 페이지에서 가져온 텍스트 (디버깅/출처 표시용)
-                }
-            )
+            page_data = {
+                "manual_id": manual_id,
+                "page": page,
+                "image_path": image_path_value,
+                "image_url": image_url,
+                "text": content,  # ✅ 해당 페이지에서 가져온 텍스트 (디버깅/출처 표시용)
+            }
+            pages.append(page_data)
+            if image_path_value:
+                pending_b64.append(
+                    (page_data, _IMAGE_POOL.submit(_image_data_uri, image_path_value))
+                )
     finally:
         conn.close()
 
+    # 루프에서 던져둔 base64 인코딩 결과를 같은 dict에 제자리로 채운다
+    for page_data, fut in pending_b64:
+        try:
+            uri = fut.result()
+            if uri:
+                page_data["image_base64"] = uri
+        except Exception:
+            pass
+
     # 페이지 중에서 첫 번째를 대표로 사용 (원하면 score 기반으로 더 똑똑하게 고를 수 있음)
     main_page = pages[0] if pages else None
     manual_page_image = None
     if main_page and main_page.get("image_path"):
         page_img_path = Path(main_page["image_path"])
         if page_img_path.exists():
+            # 풀 해상도 디코드 대신 썸네일 수준만 (JPEG은 draft로 디코더 단계 축소)
             manual_page_image = Image.open(page_img_path)
+            manual_page_image.draft("RGB", (_PAGE_IMAGE_MAX_SIDE, _PAGE_IMAGE_MAX_SIDE))
+            manual_page_image.thumbnail((_PAGE_IMAGE_MAX_SIDE, _PAGE_IMAGE_MAX_SIDE))
 
     # 5. 멀티모달 답변 합성
     try:
@@ -334,33 +417,6 @@ def route_image_query(query: str, image_path: str, k: int = 5) -> Dict[str, Any]
         fallback = answer_query(combined_query, k=k)
         answer_text = fallback.get("answer", f"[합성 에러] {e}")
 
-    # --- 페이지 이미지 base64 추가 ---
-    import base64
-    enriched_pages2 = []
-    for p in pages:
-        page_data = dict(p)
-        img_path = page_data.get("image_path") or page_data.get("image_url")
-        if img_path:
-            try:
-                from pathlib import Path
-                fs_path = Path(str(img_path))
-                if fs_path.is_file():
-                    with fs_path.open("rb") as f:
-                        raw = f.read()
-                    suffix = fs_path.suffix.lower()
-                    if suffix in [".jpg", ".jpeg"]:
-                        mime = "image/jpeg"
-                    elif suffix == ".png":
-                        mime = "image/png"
-                    else:
-                        mime = "image/*"
-                    b64 = base64.b64encode(raw).decode("ascii")
-                    page_data["image_base64"] = f"data:{mime};base64,{b64}"
-            except Exception:
-                pass
-        enriched_pages2.append(page_data)
-    pages = enriched_pages2
-
     return {
         "intent": "image_query",
         "answer": answer_text,
@@ -1,7 +1,13 @@
+from pathlib import Path
+
 import google.generativeai as genai
 from PIL import Image
 from src.config import GEMINI_API_KEY
 
+# 판단용 이미지의 긴 변 상한 — YES/NO 판단에는 풀 해상도가 필요 없다
+_DETECT_MAX_SIDE = 800
+
+
 class VisualContentDetector:
     def __init__(self):
         """
@@ -10,9 +16,12 @@ class VisualContentDetector:
         genai.configure(api_key=GEMINI_API_KEY)
         self.model = genai.GenerativeModel("gemini-2.0-flash")
 
-    def has_visual_content(self, image: Image.Image) -> bool:
+    def has_visual_content(self, image: Image.Image | str | Path) -> bool:
         """
         이미지 안에 '제품 관련 시각자료'가 있는지 YES/NO 판단
+
+        경로를 넘기면 헤더만 먼저 읽고(draft) 축소 해상도로 디코드한다.
+        JPEG은 디코더 단계에서 바로 줄어들어 풀 해상도 디코드보다 훨씬 싸다.
         """
         prompt = """
 이 페이지에 '제품 관련 시각자료'가 있는지 YES 또는 NO로만 답하세요.
@@ -29,6 +38,12 @@ class VisualContentDetector:
         """
 
         try:
+            if not isinstance(image, Image.Image):
+                with Image.open(image) as raw:
+                    raw.draft("RGB", (_DETECT_MAX_SIDE, _DETECT_MAX_SIDE))
+                    image = raw.convert("RGB")
+                image.thumbnail((_DETECT_MAX_SIDE, _DETECT_MAX_SIDE))
+
             response = self.model.generate_content(
                 [prompt, image],
                 generation_config={"max_output_tokens": 5}
@@ -37,4 +52,4 @@ class VisualContentDetector:
             return "YES" in ans
         except Exception as e:
             print("[ERROR] Vision 판단 실패:", e)
-            return False
\ No newline at end of file
+            return False
@@ -5,11 +5,13 @@ from __future__ import annotations
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from .routes import router as rag_router  # RAG 라우터
 
-app = FastAPI(title="Mindual RAG API")
+# base64 이미지가 섞인 큰 응답에서 기본 json.dumps보다 orjson이 훨씬 빠름
+app = FastAPI(title="Mindual RAG API", default_response_class=ORJSONResponse)
 
 # 프론트(vite dev 서버)와 CORS 맞추기
 origins = [
@@ -3,14 +3,19 @@ from __future__ import annotations
 
 from typing import List, Optional
 from datetime import datetime
-import sqlite3
+import asyncio
+import re
+from functools import lru_cache
 
+import aiosqlite
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import google.generativeai as genai
 
 from src.config import DB_PATH, GEMINI_API_KEY, GEMINI_MODEL_ID
 from src.index.build_embeddings_and_index import search
+from src.agent.query_rag import context_sql
+from db.page_images import get_page_image_map
 from src.calendar.google_calendar_client import list_upcoming_events
 from src.parse.rules import extract_reminder
 from src.integrations.google_calendar import create_event
@@ -22,20 +27,34 @@ from src.agent.visual_detector import VisualContentDetector
 router = APIRouter()
 
 
+# ---------- DB 연결 (요청마다 connect/close 하지 않음) ----------
+# /rag/query 핸들러가 async로 바뀌면서 이벤트 루프에서 직접 쓰는
+# aiosqlite 연결 하나를 지연 생성해서 재사용한다.
+_aio_conn: aiosqlite.Connection | None = None
+_aio_conn_lock = asyncio.Lock()
+
+
+async def _get_aconn() -> aiosqlite.Connection:
+    global _aio_conn
+    if _aio_conn is None:
+        async with _aio_conn_lock:
+            if _aio_conn is None:
+                _aio_conn = await aiosqlite.connect(DB_PATH)
+    return _aio_conn
+
+
 # ---------- 유틸: 한국어 일정 문장 포맷 ----------
 
-def _format_korean_datetime(dt: datetime, title: str) -> str:
-    weekday_names = ["월", "화", "수", "목", "금", "토", "일"]
-    w = weekday_names[dt.weekday()]
-    day = dt.day
+# 요일 테이블은 모듈 상수로 (호출마다 리스트를 다시 만들지 않음)
+WEEKDAY_KO = ("월", "화", "수", "목", "금", "토", "일")
 
-    if dt.minute == 0:
-        time_str = f"{dt.hour}시"
-    else:
-        time_str = f"{dt.hour}시 {dt.minute}분"
+
+def _format_korean_datetime(dt: datetime, title: str) -> str:
+    w = WEEKDAY_KO[dt.weekday()]
+    time_str = f"{dt.hour}시" if dt.minute == 0 else f"{dt.hour}시 {dt.minute}분"
 
     # 예: 일요일(30일) 오전 10시에 "에어컨 청소" 일정이 등록되었습니다.
-    return f"{w}요일({day}일) {time_str}에 \"{title}\" 일정이 등록되었습니다."
+    return f"{w}요일({dt.day}일) {time_str}에 \"{title}\" 일정이 등록되었습니다."
 
 # ---------- Pydantic 모델 ----------
 class RagRequest(BaseModel):
@@ -86,6 +105,21 @@ def _call_gemini(prompt: str) -> str:
 
     return text or "응답 생성에 실패했습니다."
 
+# 리마인더 의도 키워드 (detect_intent 전용, 호출마다 리스트를 다시 만들지 않음)
+REMINDER_KEYWORDS = frozenset([
+    "예약해줘", "예약 해줘",
+    "예약해 줘", "예약 해 줘",
+    "일정 추가", "일정 잡아줘", "일정 잡아 줘",
+    "일정 등록", "일정 넣어줘",
+    "알림 설정", "알림 맞춰줘",
+    "리마인드", "리마인더",
+    "캘린더에", "캘린더 등록",
+])
+
+# 부분 문자열 매칭이라 set 조회로는 못 바꾸고, 키워드 루프 대신 regex 한 번 스캔
+_REMINDER_KW_RE = re.compile("|".join(map(re.escape, sorted(REMINDER_KEYWORDS))))
+
+
 def detect_intent(text: str) -> str:
     """
     사용자의 한국어 문장을 보고
@@ -93,25 +127,15 @@ def detect_intent(text: str) -> str:
     - 'rag'      : 매뉴얼 질문
     으로 대충 나눠주는 간단한 규칙 기반 인텐트 감지기
     """
-    text = text.strip()
-
-    reminder_keywords = [
-        "예약해줘", "예약 해줘",
-        "예약해 줘", "예약 해 줘",
-        "일정 추가", "일정 잡아줘", "일정 잡아 줘",
-        "일정 등록", "일정 넣어줘",
-        "알림 설정", "알림 맞춰줘",
-        "리마인드", "리마인더",
-        "캘린더에", "캘린더 등록",
-    ]
-
-    if any(kw in text for kw in reminder_keywords):
+    if _REMINDER_KW_RE.search(text):
         return "reminder"
 
     # 기본값: RAG 질문
     return "rag"
 
 # 브라우저가 쓸 수 있는 이미지 만들기
+# 페이지 경로 집합이 작고 고정적이라 변환 결과를 메모이즈 (요청마다 문자열 가공 반복 방지)
+@lru_cache(maxsize=4096)
 def _to_page_image_url(path: str | None) -> str | None:
     if not path:
         return None
@@ -136,10 +160,14 @@ def _to_page_image_url(path: str | None) -> str | None:
 answer_agent = AnswerSynthesisAgent()
 visual_detector = VisualContentDetector()
 
+# Gemini에 넘길 페이지 이미지의 긴 변 상한 (풀 해상도 디코드 방지)
+_PAGE_IMAGE_MAX_SIDE = 1024
+
 # ---------- /rag/query 엔드포인트 ----------
 
 @router.post("/rag/query", response_model=RagResponse)
-def rag_query(body: RagRequest) -> RagResponse:
+async def rag_query(body: RagRequest) -> RagResponse:
+    """async 핸들러: DB는 aiosqlite, 블로킹 작업(임베딩/LLM/이미지)은 to_thread."""
     print(">>> /rag/query called!", body.dict())
 
     # 0) intent 결정: body.intent가 있으면 우선, 없으면 서버에서 감지
@@ -171,7 +199,7 @@ def rag_query(body: RagRequest) -> RagResponse:
             )
 
         try:
-            event = create_event(title, start_dt, end_dt)
+            event = await asyncio.to_thread(create_event, title, start_dt, end_dt)
             print("[REMINDER] calendar event created:", event.get("id"))
         except Exception as e:
             print("[REMINDER] calendar error:", repr(e))
@@ -184,42 +212,41 @@ def rag_query(body: RagRequest) -> RagResponse:
     # rag
     print("[RAG] start:", body.query)
 
-    # 1) FAISS 검색
-    results = search("chunks", body.query, k=body.k)
+    # 1) FAISS 검색 (임베딩 API 호출 포함 → 워커 스레드)
+    results = await asyncio.to_thread(search, "chunks", body.query, body.k)
     print("[RAG] search done. hits:", len(results))
 
-    # 2) DB에서 컨텍스트 로드
-    conn = sqlite3.connect(DB_PATH)
+    # 2) DB에서 컨텍스트 로드 (히트 id들을 IN 리스트로 묶어 한 번에 조회)
+    conn = await _get_aconn()
     contexts: List[RagContext] = []
 
-    try:
-        for rid, score in results:
-            row = conn.execute(
-                """
-                SELECT c.content, c.manual_id, c.page, p.path
-                FROM chunks c
-                LEFT JOIN page_images p
-                  ON c.manual_id = p.manual_id AND c.page = p.page
-                WHERE c.id = ?
-                """,
-                (rid,),
-            ).fetchone()
-
-            if not row:
-                continue
-
-            content, manual_id, page, page_img = row
-            contexts.append(
-                RagContext(
-                    text=content,
-                    page=page,
-                    manual_id=manual_id,
-                    page_image=_to_page_image_url(page_img),
-                    score=score,
-                )
+    rids = [rid for rid, _ in results]
+    row_by_id = {}
+    if rids:
+        cursor = await conn.execute(context_sql(len(rids)), rids)
+        rows = await cursor.fetchall()
+        row_by_id = {r[0]: r for r in rows}
+
+    # 이미지 경로는 시작 시 올려둔 인메모리 매핑에서 조회
+    page_image_map = get_page_image_map()
+
+    # FAISS 점수 순서 유지
+    for rid, score in results:
+        row = row_by_id.get(rid)
+        if not row:
+            continue
+
+        _, content, manual_id, page = row
+        page_img = page_image_map.get((manual_id, page))
+        contexts.append(
+            RagContext(
+                text=content,
+                page=page,
+                manual_id=manual_id,
+                page_image=_to_page_image_url(page_img),
+                score=score,
             )
-    finally:
-        conn.close()
+        )
 
     print("[RAG] context loaded:", len(contexts))
 
@@ -243,19 +270,29 @@ def rag_query(body: RagRequest) -> RagResponse:
     selected_image = None
 
     if page_img_path:
-        try:
-            img = Image.open(page_img_path).convert("RGB")
+        def _load_and_check(path: str):
+            # 풀 해상도로 디코드하지 않고 썸네일 수준(긴 변 1024px)만 만든다.
+            # draft는 JPEG이면 디코더 단계에서 바로 축소해서 훨씬 싸다.
+            img = Image.open(path)
+            img.draft("RGB", (_PAGE_IMAGE_MAX_SIDE, _PAGE_IMAGE_MAX_SIDE))
+            img = img.convert("RGB")
+            img.thumbnail((_PAGE_IMAGE_MAX_SIDE, _PAGE_IMAGE_MAX_SIDE))
             # 시각 자료가 실제로 있는 페이지인지 확인
-            if visual_detector.has_visual_content(img):
-                selected_image = img
+            return img if visual_detector.has_visual_content(img) else None
+
+        try:
+            # 이미지 디코드 + Vision 판단은 모두 블로킹 → 워커 스레드
+            selected_image = await asyncio.to_thread(_load_and_check, page_img_path)
+            if selected_image is not None:
                 print(f"[RAG][IMAGE] using page image: {page_img_path}")
             else:
                 print(f"[RAG][IMAGE] no visual content detected for {page_img_path}")
         except Exception as e:
             print("[RAG][IMAGE] failed to open image:", repr(e))
 
-    # 5) 최종 답변 합성 (텍스트 + 선택적 이미지)
-    result = answer_agent.synthesize(
+    # 5) 최종 답변 합성 (텍스트 + 선택적 이미지 / Gemini 호출 → 워커 스레드)
+    result = await asyncio.to_thread(
+        answer_agent.synthesize,
         query=body.query,
         retrieved_sentences=retrieved_sentences,
         image=selected_image,
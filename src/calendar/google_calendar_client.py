@@ -10,14 +10,20 @@ from googleapiclient.discovery import build
 SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
 
 
+_service = None  # 캐시된 Calendar 서비스 객체
+
+
 def _get_service():
     """
     token.json + SCOPES 기반으로 Calendar 서비스 클라이언트 생성.
     (scripts/google_calendar_auth.py에서 이미 token.json 발급했다고 가정)
+    요청마다 discovery를 다시 돌리지 않도록 최초 1회만 빌드해서 재사용.
     """
-    creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-    service = build("calendar", "v3", credentials=creds)
-    return service
+    global _service
+    if _service is None:
+        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+        _service = build("calendar", "v3", credentials=creds)
+    return _service
 
 
 def list_upcoming_events(max_results: int = 10) -> List[Dict[str, Any]]:
@@ -51,9 +57,11 @@ def list_upcoming_events(max_results: int = 10) -> List[Dict[str, Any]]:
 
         if dt_str:
             # "2025-11-17" or "2025-11-17T09:00:00+09:00"
-            date_str = dt_str[0:10]
+            # C 구현 fromisoformat으로 한 번 파싱하고 한 번 포맷 (문자열 슬라이싱 반복보다 빠름)
+            dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+            date_str = dt.strftime("%Y-%m-%d")
             if "T" in dt_str:
-                time_str = dt_str.split("T")[1][0:5]  # "09:00"
+                time_str = dt.strftime("%H:%M")
 
         parsed.append(
             {
@@ -17,11 +17,14 @@ SQLite DB(chunks, figures)을 읽어 텍스트 임베딩 생성 → FAISS 인덱
 from __future__ import annotations
 import argparse
 import json
+import re
 import sqlite3
 import time
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional
 
 import faiss  # type: ignore
 import numpy as np
@@ -56,25 +59,52 @@ DB_PATH         = getattr(_cfg, "DB_PATH", "./manuals.sqlite")
 EMBED_MODEL     = getattr(_cfg, "EMBED_MODEL", "text-embedding-004")
 
 BATCH = 64  # DB 로우 배치 크기(임베딩 호출은 내부에서 단건씩 백오프)
+EMBED_WORKERS = 4  # 동시에 날릴 임베딩 배치 수 (429가 잦으면 줄일 것)
+MAX_INFLIGHT_BATCHES = EMBED_WORKERS * 2  # 제출 대기 포함 in-flight 배치 상한 (텍스트 큐 적체 방지)
+HNSW_MIN_ROWS = 10_000  # 이 이상이면 브루트포스 대신 HNSW 그래프 인덱스 사용
+SQ_MIN_ROWS = 100_000  # 이 이상이면 HNSW + SQ8 양자화로 벡터 메모리 4배 절감
+HNSW_EF_SEARCH = 64  # HNSW 질의 시 탐색 폭 (recall/속도 트레이드오프)
 INDEX_DIR = Path("../agent/indexes")
 INDEX_DIR.mkdir(parents=True, exist_ok=True)
 
-@dataclass
-class Row:
-    rid: int
-    text: str
+# (rid, text) 튜플 행 — 행마다 객체/딕셔너리를 만들지 않는 SoA 스타일 처리용
+Row = Tuple[int, str]
 
 # ---------- utils ----------
 
 def l2_normalize(x: np.ndarray) -> np.ndarray:
-    norms = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
-    return x / norms
+    # faiss.normalize_L2는 SIMD로 제자리 정규화 → 복사본 두 개(norms, 나눗셈 결과) 제거
+    x = np.ascontiguousarray(x, dtype="float32")
+    faiss.normalize_L2(x)
+    return x
 
 def _setup_genai():
     if not GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY not set. Put it in .env")
     genai.configure(api_key=GEMINI_API_KEY)
 
+# 429 에러 본문에 섞여 오는 "retry_delay { seconds: N }" (gRPC RetryInfo) 파싱용
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)")
+
+def _server_retry_delay(err: Exception) -> Optional[float]:
+    """서버가 알려준 재시도 대기 시간(초)을 꺼낸다. 없으면 None.
+
+    google-api-core 예외는 retry_delay 속성으로, 그 외에는 에러 메시지의
+    RetryInfo 텍스트로 전달된다. 블라인드 지수 백오프보다 정확하게 쉰다.
+    """
+    delay = getattr(err, "retry_delay", None)
+    if delay is not None:
+        secs = getattr(delay, "total_seconds", None)
+        if callable(secs):
+            return float(secs())
+        secs = getattr(delay, "seconds", None)
+        if secs is not None:
+            return float(secs)
+    m = _RETRY_DELAY_RE.search(str(err))
+    if m:
+        return float(m.group(1))
+    return None
+
 def _embed_one(text: str,
                retries: int = 6,
                base: float = 1.5,
@@ -128,7 +158,10 @@ def _embed_one(text: str,
             msg = str(e)
             last_err = e
             if "Resource exhausted" in msg or "429" in msg or "exceeded" in msg:
-                sleep = (base ** attempt) + np.random.uniform(0, jitter)
+                # 서버가 대기 시간을 알려줬으면 그만큼만, 아니면 지수 백오프
+                server = _server_retry_delay(e)
+                sleep = (server if server is not None else base ** attempt) \
+                    + np.random.uniform(0, jitter)
                 print(f"⏳ embed retry {attempt+1}/{retries} ... {sleep:.1f}s ({msg[:80]}...)")
                 time.sleep(sleep)
                 continue
@@ -137,23 +170,87 @@ def _embed_one(text: str,
     print(f"⚠️ embed failed after retries; using zero vector. err={last_err}")
     return np.zeros((1, 768), dtype="float32")
 
+def _embed_batch(texts: List[str],
+                 retries: int = 6,
+                 base: float = 1.5,
+                 jitter: float = 0.3) -> List[np.ndarray]:
+    """
+    batchEmbedContents: 텍스트 리스트를 한 번의 HTTP 호출로 임베딩.
+    (단건 호출 반복 대비 왕복 횟수를 배치 크기만큼 줄인다)
+    """
+
+    def _extract_batch_values(out) -> list:
+        # dict 형태: {"embedding": [[...], [...]]}
+        if isinstance(out, dict):
+            emb = out.get("embedding")
+            if isinstance(emb, list) and emb and isinstance(emb[0], list):
+                return emb
+            if "embeddings" in out:
+                return [
+                    e["values"] if isinstance(e, dict) else getattr(e, "values", e)
+                    for e in out["embeddings"]
+                ]
+        # 객체 형태
+        if hasattr(out, "embeddings"):
+            return [getattr(e, "values", e) for e in out.embeddings]
+        raise RuntimeError(f"Unexpected batch embed output: {type(out)}")
+
+    last_err = None
+    for attempt in range(retries):
+        try:
+            out = genai.embed_content(model=EMBED_MODEL, content=texts)
+            vals = _extract_batch_values(out)
+            return [np.array(v, dtype="float32").reshape(1, -1) for v in vals]
+        except Exception as e:
+            msg = str(e)
+            last_err = e
+            if "Resource exhausted" in msg or "429" in msg or "exceeded" in msg:
+                server = _server_retry_delay(e)
+                sleep = (server if server is not None else base ** attempt) \
+                    + np.random.uniform(0, jitter)
+                print(f"⏳ batch embed retry {attempt+1}/{retries} ... {sleep:.1f}s ({msg[:80]}...)")
+                time.sleep(sleep)
+                continue
+            break  # 배치 자체를 못 받는 에러면 단건 폴백으로
+
+    print(f"⚠️ batch embed failed; falling back to per-text calls. err={last_err}")
+    return [_embed_one(t) for t in texts]
+
+
+# batchEmbedContents가 한 번에 받는 최대 텍스트 수
+EMBED_API_BATCH = 100
+
+
 def gemini_embed_texts(texts: List[str]) -> np.ndarray:
     """
-    안전모드: 단건 호출을 반복하여 배치 처리.
+    텍스트들을 batchEmbedContents로 묶어 임베딩 (빈 텍스트는 제로 벡터).
     """
     _setup_genai()
-    vecs: List[np.ndarray] = []
-    for t in texts:
-        vecs.append(_embed_one(t))
-    return np.vstack(vecs)
-
-def batched(it: List[Row], size: int) -> Iterable[List[Row]]:
-    for i in range(0, len(it), size):
-        yield it[i : i + size]
+    vecs: List[Optional[np.ndarray]] = [None] * len(texts)
+
+    # 빈 텍스트는 API로 보내지 않고 제로 벡터 처리
+    nonempty = [(i, t) for i, t in enumerate(texts) if t and t.strip()]
+    for start in range(0, len(nonempty), EMBED_API_BATCH):
+        part = nonempty[start : start + EMBED_API_BATCH]
+        for (i, _), v in zip(part, _embed_batch([t for _, t in part])):
+            vecs[i] = v
+
+    dim = next((v.shape[1] for v in vecs if v is not None), 768)
+    filled = [v if v is not None else np.zeros((1, dim), dtype="float32") for v in vecs]
+    return np.vstack(filled) if filled else np.zeros((0, dim), dtype="float32")
+
+def batched(it: Iterable[Row], size: int) -> Iterable[List[Row]]:
+    it = iter(it)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
 
 # ---------- DB IO ----------
 
-def load_chunks(conn: sqlite3.Connection, manual_id: Optional[int] = None) -> List[Row]:
+def load_chunks(conn: sqlite3.Connection, manual_id: Optional[int] = None) -> Iterable[Row]:
+    """chunks를 한 행씩 스트리밍 (fetchall로 전체를 RAM에 올리지 않음)."""
     cur = conn.cursor()
     if manual_id:
         cur.execute(
@@ -165,22 +262,21 @@ def load_chunks(conn: sqlite3.Connection, manual_id: Optional[int] = None) -> Li
         cur.execute(
             "SELECT id, content FROM chunks WHERE content IS NOT NULL AND TRIM(content) != ''"
         )
-    return [Row(rid=i, text=c) for (i, c) in cur.fetchall()]
+    yield from cur
 
 def load_figures(conn: sqlite3.Connection,
                  manual_id: Optional[int] = None,
-                 use_ocr: bool = False) -> List[Row]:
+                 use_ocr: bool = False) -> Iterable[Row]:
+    """figures를 한 행씩 스트리밍 (빈 캡션/OCR은 건너뜀)."""
     cur = conn.cursor()
     sel = "COALESCE(NULLIF(TRIM(ocr),''), NULLIF(TRIM(caption),''))" if use_ocr else "NULLIF(TRIM(caption),'')"
     if manual_id:
         cur.execute(f"SELECT id, {sel} FROM figures WHERE manual_id = ?", (manual_id,))
     else:
         cur.execute(f"SELECT id, {sel} FROM figures")
-    rows = []
-    for rid, text in cur.fetchall():
+    for rid, text in cur:
         if text:
-            rows.append(Row(rid=rid, text=text))
-    return rows
+            yield (rid, text)
 
 # ---------- FAISS save/load ----------
 
@@ -195,35 +291,111 @@ def save_index(name: str, index: faiss.Index, id_map: List[int]):
 
 # ---------- Build ----------
 
-def build_index(rows: List[Row], name: str):
-    if not rows:
+def build_index(rows: Iterable[Row], name: str):
+    _setup_genai()
+
+    # 임베딩 호출은 IO-bound → 배치 여러 개를 동시에 날려 지연을 겹친다.
+    # in-flight 배치 수를 제한하므로 rows가 스트리밍 제너레이터일 때
+    # 텍스트는 전송 대기 중인 배치 분량만 메모리에 남는다. 결과 임베딩은
+    # 배치 단위로 모아 두었다가 전체 행 수가 확정된 뒤 최종 행렬에 복사.
+    id_map: List[int] = []
+    offsets: List[Tuple[int, int]] = []  # 배치 bi → (시작 행, 행 수)
+    done: Dict[int, np.ndarray] = {}
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as pool:
+        futs: Dict = {}
+        for bi, batch in enumerate(batched(rows, BATCH)):
+            ids, texts = zip(*batch)
+            offsets.append((len(id_map), len(ids)))
+            id_map.extend(ids)
+            futs[pool.submit(gemini_embed_texts, list(texts))] = bi
+            if len(futs) >= MAX_INFLIGHT_BATCHES:
+                ready, _ = wait(futs, return_when=FIRST_COMPLETED)
+                for fut in ready:
+                    done[futs.pop(fut)] = fut.result()
+        for fut in as_completed(list(futs)):
+            done[futs.pop(fut)] = fut.result()
+
+    if not id_map:
         print(f"⚠️ no rows for {name}")
         return
-    vecs: List[np.ndarray] = []
-    id_map: List[int] = []
-    for batch in batched(rows, BATCH):
-        texts = [r.text for r in batch]
-        emb = gemini_embed_texts(texts)
-        vecs.append(emb)
-        id_map.extend([r.rid for r in batch])
-    X = np.vstack(vecs).astype("float32")
+    n_rows = len(id_map)
+
+    # 최종 크기로 한 번 할당하고 각 배치를 제 행 슬라이스에 복사 (복사 즉시 해제)
+    dim = next(iter(done.values())).shape[1]
+    X = np.empty((n_rows, dim), dtype="float32")
+    for bi, (start, n) in enumerate(offsets):
+        X[start : start + n] = done.pop(bi)
     X = l2_normalize(X)
-    index = faiss.IndexFlatIP(X.shape[1])  # cosine = inner product on L2-normalized vectors
+    # 작은 코퍼스는 브루트포스가 충분히 빠르고 recall 100%.
+    # 커지면 HNSW로 전환해 질의 시간을 ~log N으로 (정규화 벡터라 IP=cosine 유지),
+    # 아주 커지면 SQ8 스칼라 양자화로 벡터 저장 메모리를 4배 줄인다.
+    if n_rows < HNSW_MIN_ROWS:
+        index = faiss.IndexFlatIP(X.shape[1])  # cosine = inner product on L2-normalized vectors
+    elif n_rows < SQ_MIN_ROWS:
+        index = faiss.IndexHNSWFlat(X.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+    else:
+        index = faiss.index_factory(X.shape[1], "HNSW32,SQ8", faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        index.train(X)  # SQ8은 스케일 학습 필요
     index.add(X)
     save_index(name, index, id_map)
 
 # ---------- Query Test ----------
 
-def search(name: str, query: str, k: int = 5) -> List[Tuple[int, float]]:
+# 동일 질의 반복 시 임베딩 API 호출 + FAISS 검색을 건너뛰는 결과 캐시.
+# 키에 인덱스 파일 mtime을 넣어 재빌드되면 자동으로 무효화된다.
+_SEARCH_CACHE: dict = {}
+_SEARCH_CACHE_MAX = 256
+
+@lru_cache(maxsize=8)
+def _get_index(name: str, mtime: float) -> Tuple[faiss.Index, List[int]]:
+    """인덱스 + id 맵을 메모리에 캐시 (질의마다 디스크 재로드/JSON 파싱 방지).
+
+    mtime을 키에 넣어 인덱스가 재빌드되면 자동으로 새로 읽는다.
+    """
+    # mmap 로드: OS가 필요한 페이지만 지연 로딩 → 콜드스타트 즉시, RSS는 워킹셋만
+    index = faiss.read_index(
+        str(INDEX_DIR / f"{name}.faiss"),
+        faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+    )
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    id_map = json.loads((INDEX_DIR / f"{name}.map.json").read_text(encoding="utf-8"))["ids"]
+    return index, id_map
+
+def search_many(name: str, queries: List[str], k: int = 5) -> List[List[Tuple[int, float]]]:
+    """여러 질의를 행렬로 묶어 FAISS를 한 번만 호출한다.
+
+    질의별로 index.search를 반복하는 것보다 BLAS 배치 연산을 타기 때문에
+    동시 요청/멀티턴 처리에서 질의당 비용이 크게 내려간다.
+    """
     _setup_genai()
     path = INDEX_DIR / f"{name}.faiss"
-    idfile = INDEX_DIR / f"{name}.map.json"
-    index = faiss.read_index(str(path))
-    id_map = json.loads(idfile.read_text(encoding="utf-8"))["ids"]
-    qv = gemini_embed_texts([query]).astype("float32")
+    index, id_map = _get_index(name, path.stat().st_mtime)
+    qv = gemini_embed_texts(queries).astype("float32")
     qv = l2_normalize(qv)
     sims, idxs = index.search(qv, k)
-    return [(id_map[i], float(s)) for i, s in zip(idxs[0], sims[0]) if i != -1]
+    return [
+        [(id_map[i], float(s)) for i, s in zip(row_i, row_s) if i != -1]
+        for row_i, row_s in zip(idxs, sims)
+    ]
+
+def search(name: str, query: str, k: int = 5) -> List[Tuple[int, float]]:
+    path = INDEX_DIR / f"{name}.faiss"
+
+    cache_key = (name, query, k, path.stat().st_mtime)
+    cached = _SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
+    out = search_many(name, [query], k)[0]
+
+    if len(_SEARCH_CACHE) >= _SEARCH_CACHE_MAX:
+        # 스레드풀에서 동시에 evict하면 같은 키를 집을 수 있으므로 default로 KeyError 방지
+        _SEARCH_CACHE.pop(next(iter(_SEARCH_CACHE)), None)  # 가장 오래된 항목부터 제거
+    _SEARCH_CACHE[cache_key] = tuple(out)
+    return out
 
 # ---------- CLI ----------
 
@@ -237,16 +409,16 @@ def main():
 
     conn = sqlite3.connect(DB_PATH)
     try:
-        # chunks
-        chunk_rows = load_chunks(conn, args.manual_id or None)
-        print(f"🧱 chunks rows: {len(chunk_rows)}")
-        build_index(chunk_rows, "chunks")
+        # chunks (스트리밍 — 행 수는 save_index가 출력)
+        build_index(load_chunks(conn, args.manual_id or None), "chunks")
 
         # figures (옵션)
         if args.include_figures:
-            fig_rows = load_figures(conn, args.manual_id or None, use_ocr=args.use_figure_ocr)
-            print(f"🖼  figures rows: {len(fig_rows)} (use_ocr={args.use_figure_ocr})")
-            build_index(fig_rows, "figures")
+            print(f"🖼  figures (use_ocr={args.use_figure_ocr})")
+            build_index(
+                load_figures(conn, args.manual_id or None, use_ocr=args.use_figure_ocr),
+                "figures",
+            )
     finally:
         conn.close()
 
@@ -1,17 +1,36 @@
 # src/index/embed.py
 # 임베딩/FAISS
 import sqlite3
+import threading
 from typing import List, Dict
 from src.config import DB_PATH, RAG_MAX_DOCS
 
+# FTS 매치 + 본문 + 페이지 이미지 경로를 한 문장으로 조회.
+# SQL 텍스트를 모듈 상수로 고정해 두면 연결의 statement cache에 한 번만
+# 컴파일되고 이후 호출은 그대로 재사용된다.
+_FTS_SQL = """
+SELECT c.id, c.manual_id, c.section_id, c.page, c.content, p.path AS page_image
+FROM chunks_fts f
+JOIN chunks c ON c.id = f.rowid
+LEFT JOIN page_images p
+  ON p.manual_id = c.manual_id AND p.page = c.page
+WHERE chunks_fts MATCH ?
+LIMIT ?
+"""
+
+# 검색마다 connect/close 하지 않도록 스레드별 연결 재사용
+_local = threading.local()
+
+
+def _get_conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+    return conn
+
+
 def fts_search(query: str, limit: int = RAG_MAX_DOCS) -> List[Dict]:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        rows = conn.execute(
-            "SELECT id, manual_id, section_id, page, content FROM chunks_fts WHERE chunks_fts MATCH ? LIMIT ?",
-            (query, limit)
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _get_conn().execute(_FTS_SQL, (query, limit)).fetchall()
+    return [dict(r) for r in rows]
@@ -6,7 +6,8 @@ PDF 1개를 페이지 이미지로 렌더 → Gemini Flash로 OCR → 텍스트/
 """
 
 from __future__ import annotations
-import argparse, json, os, random, re, sqlite3, time, sys
+import argparse, asyncio, io, json, os, random, re, sqlite3, time, sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
@@ -88,17 +89,84 @@ def retry_with_backoff(fn, *, retries=6, base=1.5, jitter=0.3, on_msg=""):
             raise
     raise RuntimeError(f"재시도 초과: {on_msg}")
 
+OCR_PROMPT = (
+    "이 이미지는 전자기기 사용설명서의 한 페이지입니다. "
+    "보이는 모든 텍스트를 가능한 정확도로 추출해 주세요. "
+    "줄바꿈과 리스트, 표 구조(가능하면 마크다운 테이블)를 보존해 주세요."
+)
+
+# 동시에 날릴 OCR 요청 수 (429가 잦으면 줄일 것)
+OCR_CONCURRENCY = 4
+
+# 업로드 전 이미지 긴 변 상한 — Gemini가 어차피 다운스케일하므로 대역폭만 낭비
+OCR_MAX_SIDE = 1536
+
+# 저해상도 OCR 결과가 이보다 짧으면 고해상도로 한 번 더 시도
+RETRY_DPI = 300
+GARBLED_MIN_CHARS = 30
+
 def gemini_ocr(model, image: Image.Image) -> str:
-    prompt = (
-        "이 이미지는 전자기기 사용설명서의 한 페이지입니다. "
-        "보이는 모든 텍스트를 가능한 정확도로 추출해 주세요. "
-        "줄바꿈과 리스트, 표 구조(가능하면 마크다운 테이블)를 보존해 주세요."
-    )
     def _call():
-        return model.generate_content([prompt, image])
+        return model.generate_content([OCR_PROMPT, image])
     resp = retry_with_backoff(_call, on_msg="Gemini OCR")
     return resp.text or ""
 
+async def retry_with_backoff_async(fn, *, retries=6, base=1.5, jitter=0.3, on_msg=""):
+    for attempt in range(retries):
+        try:
+            return await fn()
+        except Exception as e:
+            msg = str(e)
+            if "Resource exhausted" in msg or "429" in msg or "exceeded" in msg:
+                sleep = (base ** attempt) + random.uniform(0, jitter)
+                print(f"⏳ {on_msg} 재시도 {attempt+1}/{retries} ... {sleep:.1f}s 대기 (사유: {msg[:80]}...)")
+                await asyncio.sleep(sleep); continue
+            raise
+    raise RuntimeError(f"재시도 초과: {on_msg}")
+
+async def gemini_ocr_async(model, image_part, on_msg: str = "Gemini OCR") -> str:
+    """image_part: PIL.Image 또는 {"mime_type":..., "data": bytes} blob."""
+    async def _call():
+        return await model.generate_content_async([OCR_PROMPT, image_part])
+    resp = await retry_with_backoff_async(_call, on_msg=on_msg)
+    return resp.text or ""
+
+def _jpeg_blob_for_upload(buf: bytes) -> Dict:
+    """업로드용 JPEG blob 구성.
+
+    PIL Image 객체를 SDK에 넘기면 내부에서 PNG로 재인코딩(크고 느림)되므로
+    mime_type/data dict로 JPEG 바이트를 직접 전달한다. 긴 변이 상한을
+    넘는 페이지만 축소 후 한 번 재인코딩하고, 그 외에는 원본 버퍼 그대로.
+    """
+    img = Image.open(io.BytesIO(buf))  # 헤더만 읽음 (size 확인용)
+    if max(img.size) > OCR_MAX_SIDE:
+        # JPEG은 draft로 디코더 단계에서 축소 → 업로드 픽셀 수 상한
+        img.draft("RGB", (OCR_MAX_SIDE, OCR_MAX_SIDE))
+        img.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE))
+        out = io.BytesIO()
+        img.convert("RGB").save(out, "JPEG", quality=85)
+        buf = out.getvalue()
+    return {"mime_type": "image/jpeg", "data": buf}
+
+async def _ocr_pages_async(model, page_bufs: List[bytes], per_page_sleep: float) -> List[str]:
+    """페이지 JPEG 버퍼들을 세마포어 한도 내에서 동시에 OCR (순서 보존).
+
+    OCR은 네트워크 지연이 지배적이라 순차 처리 대비 동시 수만큼 빨라진다.
+    입력은 렌더 단계에서 만든 인메모리 JPEG 버퍼 — 디스크 재읽기 없음.
+    """
+    sem = asyncio.Semaphore(OCR_CONCURRENCY)
+
+    async def _one(idx: int, buf: bytes) -> str:
+        async with sem:
+            if per_page_sleep > 0:
+                await asyncio.sleep(per_page_sleep)  # 거친 호출 간격 유지
+            blob = _jpeg_blob_for_upload(buf)
+            return await gemini_ocr_async(model, blob, on_msg=f"Gemini OCR p.{idx}")
+
+    return list(await asyncio.gather(
+        *(_one(i, b) for i, b in enumerate(page_bufs, start=1))
+    ))
+
 def infer_meta_from_filename(stem: str):
     tokens = re.split(r"[^A-Za-z0-9\-]+", stem)
     models = [t for t in tokens if re.search(r"[A-Za-z]{2,}\d{2,}", t)]
@@ -107,20 +175,20 @@ def infer_meta_from_filename(stem: str):
     return list(dict.fromkeys(models)), created_at
 
 def ensure_fts_sync(conn: sqlite3.Connection):
-    conn.execute("""
-        INSERT INTO chunks_fts(rowid, content)
-        SELECT id, content FROM chunks
-        WHERE id NOT IN (SELECT rowid FROM chunks_fts);
-    """)
+    # chunks_fts는 external-content(content='chunks') 테이블이므로
+    # anti-join으로 빠진 행을 찾는 대신 rebuild로 원본에서 선형 재구축하고
+    # optimize로 b-tree 세그먼트를 병합해 질의 비용을 줄인다.
+    conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('rebuild')")
+    conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('optimize')")
     conn.commit()
 
 # ---------- figure detection (bbox only; no crop saved) ----------
-def detect_figures(page: fitz.Page, min_area_pdf: float = 10_000.0) -> List[Tuple[float, float, float, float]]:
+def detect_figures(page_dict: Dict, min_area_pdf: float = 10_000.0) -> List[Tuple[float, float, float, float]]:
     """
     PyMuPDF 텍스트 dict에서 type=1 이미지 블록 bbox(PDF 좌표)를 수집.
     (스캔 PDF의 경우 페이지 전체 1개만 나올 수 있음. 그 외 벡터 도해는 별도 고도화 가능)
+    page.get_text("dict")는 호출부에서 페이지당 한 번만 뽑아 넘긴다.
     """
-    page_dict = page.get_text("dict")
     boxes = []
     for b in page_dict.get("blocks", []):
         if b.get("type") != 1:
@@ -137,11 +205,10 @@ def px_bbox_from_pdf_bbox(pdf_bbox: Tuple[float, float, float, float], page: fit
     r = fitz.Rect(x0, y0, x1, y1) * mat
     return (int(round(r.x0)), int(round(r.y0)), int(round(r.x1)), int(round(r.y1)))
 
-def detect_nearby_caption(page: fitz.Page,
+def detect_nearby_caption(page_dict: Dict,
                           pdf_bbox: Tuple[float, float, float, float],
                           max_vertical_gap: float = 100.0) -> Optional[str]:
     x0, y0, x1, y1 = pdf_bbox
-    page_dict = page.get_text("dict")
     best = ""
     for block in page_dict.get("blocks", []):
         if block.get("type") != 0:
@@ -166,7 +233,7 @@ def ingest_one_with_figures(pdf_path: Path,
                             brand: str,
                             language: str,
                             title: str,
-                            dpi: int = 300,
+                            dpi: int = 200,
                             min_area: float = 10_000.0,
                             per_page_sleep: float = DEFAULT_PER_PAGE_SLEEP):
     stem = pdf_path.stem
@@ -186,61 +253,110 @@ def ingest_one_with_figures(pdf_path: Path,
     )
     print(f"✅ Upserted manual id={manual_id} models={models} created_at={created_at}")
 
-    conn = sqlite3.connect(DB_PATH, timeout=10)
-    merged_parts: List[str] = []
+    # isolation_level=None = autocommit 모드. 파이썬 쪽 암묵적 BEGIN 없이
+    # 아래에서 직접 BEGIN/COMMIT으로 트랜잭션 경계를 통제한다.
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    # 페이지마다 commit(=fsync)하지 않도록 WAL + NORMAL, 행들은 모아서 한 번에 insert
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-200000")  # 페이지 캐시 약 200MB
 
+    merged_parts: List[str] = []
+    page_image_rows: List[Tuple[int, int, str]] = []
+    figure_rows: List[Tuple] = []
+
+    # 1) 모든 페이지를 먼저 렌더 (OCR 병렬화 전에 입력을 모두 준비)
+    #    JPEG 인코딩은 메모리에서 한 번만 하고, 같은 버퍼를 디스크 저장과 OCR 입력에 재사용
+    #    (pix.save 후 Image.open으로 다시 읽으면 디코드가 두 번 든다)
+    page_jpgs: List[Path] = []
+    page_bufs: List[bytes] = []
     for i, page in enumerate(doc, start=1):
-        # 1) 페이지 렌더 → jpg 저장
         page_jpg = processed_dir / f"page_{i}.jpg"
         pix = page.get_pixmap(dpi=dpi)
-        pix.save(str(page_jpg))
-
-        # page_images 테이블에는 ingest 이후 별도 뷰에서 쓰기 좋게 등록
-        conn.execute(
-            """
-            INSERT INTO page_images(manual_id, page, path)
-            VALUES(?,?,?)
-            ON CONFLICT(manual_id, page) DO UPDATE SET path=excluded.path
-            """,
-            (manual_id, i, str(page_jpg)),
+        buf = pix.tobytes("jpeg", jpg_quality=85)
+        page_jpg.write_bytes(buf)
+        # page_images 테이블에는 ingest 이후 별도 뷰에서 쓰기 좋게 등록 (루프 끝에서 일괄 insert)
+        page_image_rows.append((manual_id, i, str(page_jpg)))
+        page_jpgs.append(page_jpg)
+        page_bufs.append(buf)
+
+    # 2) OCR(네트워크 대기)과 도해 검출(CPU 파싱)을 겹친다:
+    #    OCR 전체를 백그라운드 스레드에서 돌려 두고, 기다리는 동안
+    #    메인 스레드에서 PyMuPDF 도해 bbox/캡션을 먼저 뽑는다.
+    fig_counts: List[int] = []
+    with ThreadPoolExecutor(max_workers=1) as ocr_runner:
+        ocr_future = ocr_runner.submit(
+            asyncio.run, _ocr_pages_async(model, page_bufs, per_page_sleep)
         )
-        conn.commit()
 
-        # 2) OCR (Gemini)
-        image = Image.open(page_jpg)
-        text = gemini_ocr(model, image)
+        for i, page in enumerate(doc, start=1):
+            page_jpg = page_jpgs[i - 1]
+            # 도해 bbox만 기록(크롭 저장 안 함) — figures.path는 페이지 이미지 경로로 저장
+            # 텍스트 트리 파싱은 페이지당 한 번만 (figure마다 get_text("dict") 재파싱 방지)
+            page_dict = page.get_text("dict")
+            fig_boxes = detect_figures(page_dict, min_area_pdf=min_area) or []
+            fig_counts.append(len(fig_boxes))
+            for fi, box_pdf in enumerate(fig_boxes):
+                bbox_px = px_bbox_from_pdf_bbox(box_pdf, page, dpi)
+                caption = detect_nearby_caption(page_dict, box_pdf)
+                figure_rows.append(
+                    (
+                        manual_id,
+                        i,
+                        json.dumps(list(box_pdf), ensure_ascii=False),
+                        json.dumps(list(bbox_px), ensure_ascii=False),
+                        str(page_jpg),   # ← 크롭 대신 페이지 이미지 경로를 저장
+                        None,            # thumb 없음
+                        caption or None,
+                        None,            # 추후 필요 시 그림 내 OCR
+                        json.dumps({"detector": "pymupdf_image_block", "dpi": dpi}, ensure_ascii=False),
+                    )
+                )
+
+        texts = ocr_future.result()
+    del page_bufs
+
+    # 2-1) 적응형 DPI: 기본 해상도에서 결과가 의심스럽게 짧은 페이지만 고해상도 재시도
+    if dpi < RETRY_DPI:
+        suspects = [idx for idx, t in enumerate(texts) if len(t.strip()) < GARBLED_MIN_CHARS]
+        if suspects:
+            print(f"🔁 {len(suspects)} page(s) re-OCR at dpi={RETRY_DPI}: {[s + 1 for s in suspects]}")
+            retry_bufs = [
+                doc[idx].get_pixmap(dpi=RETRY_DPI).tobytes("jpeg", jpg_quality=85)
+                for idx in suspects
+            ]
+            retried = asyncio.run(_ocr_pages_async(model, retry_bufs, per_page_sleep))
+            for idx, t in zip(suspects, retried):
+                if len(t.strip()) > len(texts[idx].strip()):
+                    texts[idx] = t
+
+    # 3) OCR 결과 순서대로 chunks insert
+    for i, text in enumerate(texts, start=1):
         if text.strip():
             insert_chunk(manual_id=manual_id, section_id=None, page=i,
                          content=text.strip(), meta={"source": "ocr", "dpi": dpi})
             merged_parts.append(text.strip())
+        print(f"📄 Page {i}: OCR {len(text)} chars, {fig_counts[i - 1]} figure-bboxes")
+
+    # 4) 모아둔 행들을 단일 트랜잭션으로 일괄 insert
+    conn.execute("BEGIN")
+    conn.executemany(
+        """
+        INSERT INTO page_images(manual_id, page, path)
+        VALUES(?,?,?)
+        ON CONFLICT(manual_id, page) DO UPDATE SET path=excluded.path
+        """,
+        page_image_rows,
+    )
+    conn.executemany(
+        """INSERT INTO figures(manual_id,page,bbox_pdf,bbox_px,path,thumb_path,caption,ocr,meta)
+           VALUES(?,?,?,?,?,?,?,?,?)""",
+        figure_rows,
+    )
+    conn.execute("COMMIT")
 
-        # 3) 도해 bbox만 기록(크롭 저장 안 함) — figures.path는 페이지 이미지 경로로 저장
-        fig_boxes = detect_figures(page, min_area_pdf=min_area) or []
-        for fi, box_pdf in enumerate(fig_boxes):
-            bbox_px = px_bbox_from_pdf_bbox(box_pdf, page, dpi)
-            caption = detect_nearby_caption(page, box_pdf)
-            conn.execute(
-                """INSERT INTO figures(manual_id,page,bbox_pdf,bbox_px,path,thumb_path,caption,ocr,meta)
-                   VALUES(?,?,?,?,?,?,?,?,?)""",
-                (
-                    manual_id,
-                    i,
-                    json.dumps(list(box_pdf), ensure_ascii=False),
-                    json.dumps(list(bbox_px), ensure_ascii=False),
-                    str(page_jpg),   # ← 크롭 대신 페이지 이미지 경로를 저장
-                    None,            # thumb 없음
-                    caption or None,
-                    None,            # 추후 필요 시 그림 내 OCR
-                    json.dumps({"detector": "pymupdf_image_block", "dpi": dpi}, ensure_ascii=False),
-                ),
-            )
-
-        conn.commit()
-        print(f"📄 Page {i}: OCR {len(text)} chars, {len(fig_boxes)} figure-bboxes")
-        if per_page_sleep > 0:
-            time.sleep(per_page_sleep)
-
-    # 4) 머지 텍스트, FTS 동기화
+    # 5) 머지 텍스트, FTS 동기화
     merged_path = processed_dir / "merged_manual.txt"
     merged_path.write_text("\n\n".join(merged_parts), encoding="utf-8")
     ensure_fts_sync(conn)
@@ -254,7 +370,7 @@ def main():
     ap.add_argument("--brand", default="")
     ap.add_argument("--language", default="ko")
     ap.add_argument("--title", default="")
-    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--dpi", type=int, default=200)
     ap.add_argument("--min_area", type=float, default=10000.0)
     ap.add_argument("--sleep", type=float, default=DEFAULT_PER_PAGE_SLEEP)
     args = ap.parse_args()
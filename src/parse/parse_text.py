@@ -1,8 +1,8 @@
 # src/parse/parse_text.py
 # OCR 결과 → 구조화
 import os
+import re
 from typing import List
-import kss
 
 
 def merge_ocr_text(input_folder="data/processed", output_file="data/processed/merged_manual.txt"):
@@ -16,18 +16,27 @@ def merge_ocr_text(input_folder="data/processed", output_file="data/processed/me
     print(f"✅ Merged OCR text saved: {output_file}")
 
 
-def split_korean_sentences(text: str) -> List[str]:
+# 한국어 문장 종결부(., !, ?, 。, …) 뒤 공백 또는 줄바꿈에서 분리
+_SENT_RE = re.compile(r"(?<=[.!?。…])\s+|\n+")
+
+
+def split_korean_sentences(text: str, precise: bool = False) -> List[str]:
     """
-    한국어 문장을 줄바꿈 + KSS 기준으로 나눠준다.
+    한국어 문장을 줄바꿈 + 종결부호 기준으로 나눠준다.
     너무 짧은 / 공백 문장은 버린다.
+
+    기본은 컴파일된 regex 한 번으로 분리 (매뉴얼 OCR 텍스트에는 충분).
+    precise=True일 때만 무거운 kss 모델을 불러 정밀 분리한다.
     """
-    chunks = [t.strip() for t in text.split("\n") if t.strip()]
-    sentences: List[str] = []
+    if precise:
+        import kss  # 느리고 무거워서 필요할 때만 import
 
-    for ch in chunks:
-        for sent in kss.split_sentences(ch):
-            s = sent.strip()
-            if s:
-                sentences.append(s)
+        sentences: List[str] = []
+        for ch in (t.strip() for t in text.split("\n") if t.strip()):
+            for sent in kss.split_sentences(ch):
+                s = sent.strip()
+                if s:
+                    sentences.append(s)
+        return sentences
 
-    return sentences
+    return [s.strip() for s in _SENT_RE.split(text) if s.strip()]
@@ -4,11 +4,28 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import lru_cache
 import re
 import zoneinfo
 
 KST = zoneinfo.ZoneInfo("Asia/Seoul")
 
+# 날짜/시간 패턴은 질의마다 다시 컴파일하지 않도록 모듈 스코프에 둔다
+DAY_RE = re.compile(r"(\d{1,2})일")
+TIME_RE = re.compile(r"(오전|오후)?\s*(\d{1,2})시(?:\s*(\d{1,2})분)?")
+
+# _extract_title용: 날짜/시간 표현 + 예약/일정/알림 동사를
+# 한 번의 스캔으로 제거하는 통합 alternation (패턴별 sub 반복 방지)
+_STRIP_RE = re.compile(
+    r"이번주|이번 주|오늘|내일|모레"
+    r"|\d{1,2}일"
+    r"|(?:오전|오후)\s*\d{1,2}시(?:\s*\d{1,2}분)?"
+    r"|일정\s*(?:추가|등록|잡아줘|잡아 줘)?"
+    r"|예약(?:해줘| 해줘|해 줘| 해 줘)"
+    r"|알림\s*(?:설정|맞춰줘|맞춰 줘)?"
+    r"|해줘"
+)
+
 WEEKDAY_MAP = {
     "월": 0,
     "화": 1,
@@ -64,7 +81,7 @@ def _parse_korean_datetime(text: str) -> datetime | None:
 
         # "30일" 같은 패턴
         if target_date is None:
-            m_day = re.search(r"(\d{1,2})일", t)
+            m_day = DAY_RE.search(t)
             if m_day:
                 day = int(m_day.group(1))
                 # 같은 달 안에서 처리 (필요하면 더 정교하게)
@@ -79,7 +96,7 @@ def _parse_korean_datetime(text: str) -> datetime | None:
         target_date = base_date
 
     # 2) 시간 (오전/오후 + 시/분)
-    m_time = re.search(r"(오전|오후)?\s*(\d{1,2})시(?:\s*(\d{1,2})분)?", t)
+    m_time = TIME_RE.search(t)
     if m_time:
         ampm = m_time.group(1)
         hour = int(m_time.group(2))
@@ -103,24 +120,18 @@ def _parse_korean_datetime(text: str) -> datetime | None:
     )
 
 
+@lru_cache(maxsize=256)
 def _extract_title(text: str) -> str:
     """
     날짜/시간/예약 관련 문구를 떼고 남은 부분을 일정 제목으로 사용.
     '이번주 일요일 오전 10시에 에어컨 청소 예약해줘' → '에어컨 청소'
     정도를 목표로 함.
+    순수 문자열 변환이라 같은 문장이 반복되면 lru_cache가 그대로 돌려준다.
     """
     t = text
 
-    # 날짜/시간 표현 제거
-    t = re.sub(r"(이번주|이번 주|오늘|내일|모레)", "", t)
-    t = re.sub(r"\d{1,2}일", "", t)
-    t = re.sub(r"(오전|오후)\s*\d{1,2}시(\s*\d{1,2}분)?", "", t)
-
-    # 예약/일정/알림 관련 동사 제거
-    t = re.sub(r"(일정\s*(추가|등록|잡아줘|잡아 줘)?)", "", t)
-    t = re.sub(r"(예약해줘|예약 해줘|예약해 줘|예약 해 줘)", "", t)
-    t = re.sub(r"(알림\s*(설정|맞춰줘|맞춰 줘)?)", "", t)
-    t = re.sub(r"해줘", "", t)
+    # 날짜/시간 표현 + 예약/일정/알림 동사 제거 (통합 패턴 한 번에)
+    t = _STRIP_RE.sub("", t)
 
     # 조사/불필요한 구두점 정리
     t = t.replace("에 ", " ")